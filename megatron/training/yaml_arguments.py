@@ -2,16 +2,14 @@
 
 """Megatron arguments."""
 
-import argparse
 import dataclasses
-import json
+import hashlib
 import os
+import pickle
+import re
+import tempfile
 import torch
-import types
 
-from itertools import chain, starmap
-from types import SimpleNamespace
-import yaml, re, os
 from types import SimpleNamespace
 
 import torch.nn.functional as F
@@ -21,15 +19,39 @@ from megatron.core.utils import get_torch_version, is_torch_min_version
 
 # Taken from https://stackoverflow.com/questions/65414773/parse-environment-variable-from-yaml-with-pyyaml
 # Allows for yaml to use environment variables
-env_pattern = re.compile(r".*?\${(.*?)}.*?")
+# The resolver is matched from the start of the scalar, the substitution pattern is not.
+# The resolver pattern skips to the first "${" without backtracking so it stays linear.
+env_resolver_pattern = re.compile(r"[^$]*(?:\$(?!\{)[^$]*)*\$\{[^}]+\}")
+env_pattern = re.compile(r"\$\{([^}]+)\}")
+env = os.environ
 def env_constructor(loader, node):
     value = loader.construct_scalar(node)
-    for group in env_pattern.findall(value):
-        assert os.environ.get(group) is not None, f"environment variable {group} in yaml not found"
-        value = value.replace(f"${{{group}}}", os.environ.get(group))
-    return value
-yaml.add_implicit_resolver("!pathex", env_pattern)
-yaml.add_constructor("!pathex", env_constructor)
+    # Look each variable up once even if the scalar references it repeatedly
+    env_values = {}
+    def replace(match):
+        name = match.group(1)
+        if name not in env_values:
+            env_value = env.get(name)
+            assert env_value is not None, f"environment variable {name} in yaml not found"
+            env_values[name] = env_value
+        return env_values[name]
+    return env_pattern.sub(replace, value)
+
+# yaml is imported on first use so runs without a yaml config do not pay for it
+_yaml_loader = None
+def _parse_yaml(text):
+    global _yaml_loader
+    import yaml
+    if _yaml_loader is None:
+        # Use the libyaml-backed loader when available, falling back to the pure-Python one.
+        # Subclass it so the env var handling does not leak into other users of the shared loaders.
+        class _EnvLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+            pass
+        # Register through the class, yaml.add_implicit_resolver would also alter the global Dumper
+        _EnvLoader.add_implicit_resolver("!pathex", env_resolver_pattern, None)
+        _EnvLoader.add_constructor("!pathex", env_constructor)
+        _yaml_loader = _EnvLoader
+    return yaml.load(text, Loader=_yaml_loader)
 
 
 str_dtype_to_torch = {
@@ -439,13 +461,80 @@ def core_transformer_config_from_yaml(args, transfomer_key = "language_model"):
     else:
         return TransformerConfig(**kw_args)
 
+# Non-string yaml keys become attribute names the way json.dumps rendered them
+_json_key_names = {True: "true", False: "false", None: "null"}
+def _ns_key(key):
+    if isinstance(key, str):
+        return key
+    if isinstance(key, bool) or key is None:
+        return _json_key_names[key]
+    return str(key)
+
+def _to_ns(obj):
+    """Recursively convert parsed yaml dicts into nested namespaces
+
+    Builds new containers so yaml aliases become independent copies
+    """
+    if isinstance(obj, dict):
+        return SimpleNamespace(**{_ns_key(k): _to_ns(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return [_to_ns(v) for v in obj]
+    return obj
+
+# Set MEGATRON_YAML_CACHE=1 to cache parsed configs under $XDG_CACHE_HOME (default ~/.cache).
+# Entries are never evicted, so the cache is opt-in.
+# Bump the version when the cached layout changes.
+YAML_CACHE_VERSION = 1
+
+def _yaml_cache_path(text):
+    """Cache file for a config, keyed on its content and the env vars it references
+
+    Returns None when caching is disabled
+    """
+    if env.get("MEGATRON_YAML_CACHE", "0").strip().lower() in ("", "0", "false", "no", "off"):
+        return None
+    cache_dir = os.path.join(env.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "megatron", "yaml")
+    env_values = sorted((name, env.get(name)) for name in set(env_pattern.findall(text)))
+    key = hashlib.sha1(f"{YAML_CACHE_VERSION}:{env_values}:{text}".encode()).hexdigest()
+    return os.path.join(cache_dir, f"{key}.pkl")
+
+def _read_yaml_cache(cache_path):
+    # Unpickling can run arbitrary code, only trust files this user wrote and nobody else can modify
+    try:
+        with open(cache_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if st.st_uid != os.getuid() or st.st_mode & 0o022:
+                return None
+            return pickle.load(f)
+    except Exception:
+        # A damaged or incompatible cache file, e.g. from another Python version, is re-parsed
+        return None
+
+def _write_yaml_cache(cache_path, config_namespace):
+    # Write to a temporary file and rename so concurrent ranks never see a partial cache
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(config_namespace, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Caching is best effort, e.g. the cache directory may be read-only
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 def load_yaml(yaml_path):
     print(f"warning using experimental yaml arguments feature, argparse arguments will be ignored")
     with open(yaml_path, "r") as f:
-        config = yaml.safe_load(f)
-        # Convert to nested namespace
-        config_namespace = json.loads(json.dumps(config), object_hook=lambda item: SimpleNamespace(**item))
-        # Add config location to namespace
-        config_namespace.yaml_cfg = yaml_path
-        return config_namespace
-
+        text = f.read()
+    cache_path = _yaml_cache_path(text)
+    config_namespace = _read_yaml_cache(cache_path) if cache_path is not None else None
+    if config_namespace is None:
+        # Convert to nested namespace, env vars are substituted before caching
+        config_namespace = _to_ns(_parse_yaml(text))
+        if cache_path is not None:
+            _write_yaml_cache(cache_path, config_namespace)
+    # Add config location to namespace
+    config_namespace.yaml_cfg = yaml_path
+    return config_namespace
@@ -0,0 +1,175 @@
+import os
+
+import pytest
+import yaml
+
+import megatron.training.yaml_arguments as yaml_arguments
+from megatron.training.yaml_arguments import _to_ns, load_yaml
+
+
+@pytest.fixture(autouse=True)
+def yaml_cache_dir(tmp_path, monkeypatch):
+    """Enable the parsed config cache in a temporary directory, not the real home"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("MEGATRON_YAML_CACHE", "1")
+    return tmp_path / "cache" / "megatron" / "yaml"
+
+
+def parse(text):
+    return yaml_arguments._parse_yaml(text)
+
+
+def write_config(tmp_path, text):
+    path = tmp_path / "config.yaml"
+    path.write_text(text)
+    return str(path)
+
+
+def fail_convert(obj):
+    raise AssertionError("config should have been served from the cache")
+
+
+def test_env_var_substitution(monkeypatch):
+    monkeypatch.setenv("MEGATRON_TEST_DATA", "/lustre/data")
+    config = parse("path: /data/${MEGATRON_TEST_DATA}/train\nroot: ${MEGATRON_TEST_DATA}\n")
+    assert config["path"] == "/data//lustre/data/train"
+    assert config["root"] == "/lustre/data"
+
+
+def test_env_var_missing(monkeypatch):
+    monkeypatch.delenv("MEGATRON_TEST_MISSING", raising=False)
+    with pytest.raises(AssertionError, match="MEGATRON_TEST_MISSING"):
+        parse("path: /data/${MEGATRON_TEST_MISSING}\n")
+
+
+def test_plain_scalars_untouched():
+    config = parse("a: 1\nb: plain\nc: cost$5\nd: '${NOT_RESOLVED}'\ne: [1.5, true]\n")
+    assert config == {"a": 1, "b": "plain", "c": "cost$5", "d": "${NOT_RESOLVED}", "e": [1.5, True]}
+
+
+def test_env_var_loader_does_not_leak(monkeypatch):
+    monkeypatch.delenv("MEGATRON_TEST_MISSING", raising=False)
+    parse("a: 1\n")
+    text = "p: /x/${MEGATRON_TEST_MISSING}\n"
+    assert yaml.safe_load(text) == {"p": "/x/${MEGATRON_TEST_MISSING}"}
+    if hasattr(yaml, "CSafeLoader"):
+        assert yaml.load(text, Loader=yaml.CSafeLoader) == {"p": "/x/${MEGATRON_TEST_MISSING}"}
+    assert yaml.dump({"p": "${MEGATRON_TEST_MISSING}"}) == "p: ${MEGATRON_TEST_MISSING}\n"
+
+
+def test_to_ns_copies_aliases():
+    config = _to_ns(parse("base: &b {sub: {x: 1}}\nderived: *b\nlst: &l [{y: 2}]\nl2: *l\n"))
+    assert config.derived.sub.x == 1 and config.l2[0].y == 2
+    assert config.base.sub is not config.derived.sub
+    assert config.lst is not config.l2 and config.lst[0] is not config.l2[0]
+    config.base.sub.x = 3
+    assert config.derived.sub.x == 1
+
+
+def test_to_ns_non_string_keys():
+    config = _to_ns(parse("2: two\n1.5: x\ntrue: t\nfalse: f\nnull: n\nsub: {3: [{4: four}]}\n"))
+    assert vars(config) == {
+        "2": "two",
+        "1.5": "x",
+        "true": "t",
+        "false": "f",
+        "null": "n",
+        "sub": config.sub,
+    }
+    assert getattr(getattr(config.sub, "3")[0], "4") == "four"
+
+
+def test_cache_miss_then_hit(tmp_path, yaml_cache_dir, monkeypatch):
+    path = write_config(tmp_path, "v: 1\nsub: {w: [1, 2]}\n")
+    config = load_yaml(path)
+    assert config.v == 1 and config.sub.w == [1, 2] and config.yaml_cfg == path
+    assert len(os.listdir(yaml_cache_dir)) == 1
+
+    monkeypatch.setattr(yaml_arguments, "_to_ns", fail_convert)
+    cached = load_yaml(path)
+    assert cached.v == 1 and cached.sub.w == [1, 2] and cached.yaml_cfg == path
+
+
+def test_cache_invalidated_by_content(tmp_path):
+    path = write_config(tmp_path, "v: 1\n")
+    st = os.stat(path)
+    assert load_yaml(path).v == 1
+    # Same size and restored mtime, as after cp -p or rsync -t
+    write_config(tmp_path, "v: 2\n")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert load_yaml(path).v == 2
+
+
+def test_cache_invalidated_by_env_var(tmp_path, yaml_cache_dir, monkeypatch):
+    path = write_config(tmp_path, "path: ${MEGATRON_TEST_DATA}/train\n")
+    monkeypatch.setenv("MEGATRON_TEST_DATA", "/a")
+    assert load_yaml(path).path == "/a/train"
+    monkeypatch.setenv("MEGATRON_TEST_DATA", "/b")
+    assert load_yaml(path).path == "/b/train"
+    assert len(os.listdir(yaml_cache_dir)) == 2
+
+
+@pytest.mark.parametrize("value", [None, "0", "false", "No", "off", ""])
+def test_cache_disabled(tmp_path, yaml_cache_dir, monkeypatch, value):
+    if value is None:
+        monkeypatch.delenv("MEGATRON_YAML_CACHE")
+    else:
+        monkeypatch.setenv("MEGATRON_YAML_CACHE", value)
+    path = write_config(tmp_path, "v: 1\n")
+    assert load_yaml(path).v == 1
+    assert load_yaml(path).v == 1
+    assert not yaml_cache_dir.exists()
+
+
+@pytest.mark.parametrize("value", ["1", "true", "Yes", "on"])
+def test_cache_enabled(tmp_path, yaml_cache_dir, monkeypatch, value):
+    monkeypatch.setenv("MEGATRON_YAML_CACHE", value)
+    assert load_yaml(write_config(tmp_path, "v: 1\n")).v == 1
+    assert len(os.listdir(yaml_cache_dir)) == 1
+
+
+@pytest.mark.skipif(os.geteuid() == 0, reason="root can write to read-only directories")
+def test_cache_read_only_dir(tmp_path, yaml_cache_dir):
+    yaml_cache_dir.mkdir(parents=True)
+    yaml_cache_dir.chmod(0o500)
+    try:
+        path = write_config(tmp_path, "v: 1\n")
+        assert load_yaml(path).v == 1
+        assert os.listdir(yaml_cache_dir) == []
+    finally:
+        yaml_cache_dir.chmod(0o700)
+
+
+def test_cache_dir_not_creatable(tmp_path, yaml_cache_dir):
+    # A file where the cache directory should be, fails the same way as a read-only dir
+    yaml_cache_dir.parent.mkdir(parents=True)
+    yaml_cache_dir.write_text("")
+    path = write_config(tmp_path, "v: 1\n")
+    assert load_yaml(path).v == 1
+    assert load_yaml(path).v == 1
+
+
+def test_cache_ignores_writable_files(tmp_path, yaml_cache_dir, monkeypatch):
+    path = write_config(tmp_path, "v: 1\n")
+    load_yaml(path)
+    (cache_file,) = yaml_cache_dir.iterdir()
+    cache_file.chmod(0o666)
+    monkeypatch.setattr(yaml_arguments, "_to_ns", fail_convert)
+    with pytest.raises(AssertionError, match="served from the cache"):
+        load_yaml(path)
+
+
+@pytest.mark.parametrize(
+    "junk",
+    [b"", b"not a pickle", b"\x80\x09junk", b"cno_such_module_for_yaml_cache\nThing\n."],
+    ids=["empty", "garbage", "protocol", "missing_module"],
+)
+def test_cache_ignores_junk_files(tmp_path, yaml_cache_dir, monkeypatch, junk):
+    path = write_config(tmp_path, "v: 1\n")
+    load_yaml(path)
+    (cache_file,) = yaml_cache_dir.iterdir()
+    cache_file.write_bytes(junk)
+    assert load_yaml(path).v == 1
+    # The re-parsed config replaced the junk file
+    monkeypatch.setattr(yaml_arguments, "_to_ns", fail_convert)
+    assert load_yaml(path).v == 1